@@ -1,224 +1,561 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 from flask_cors import CORS
+from flask_orjson import OrjsonProvider
+from dataclasses import dataclass
 from datetime import datetime, timezone
+import atexit
+import queue
+import secrets
+import sys
+import threading
+import time
 import uuid
-import json
+import orjson
 import os
+import zstandard as zstd
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
-DATA_FILE = 'data.json'
+DATA_FILE = 'data.json.zst'
+LEGACY_DATA_FILE = 'data.json'
+WAL_FILE = 'data.wal'
+WAL_COMPACT_THRESHOLD = 10000
+WRITE_BATCH_SIZE = 256
+
+
+@dataclass(slots=True, eq=False)
+class Task:
+    id: str
+    title: str
+    description: str
+    created_at: str
+
+
+@dataclass(slots=True, eq=False)
+class Comment:
+    id: str
+    task_id: str
+    content: str
+    author: str
+    created_at: str
+    updated_at: str
+
 
 tasks = {}
 comments = {}
+# task key -> {comment key: Comment}, oldest first
+comments_by_task = {}
+comment_task_keys = {}
+
+_cctx = zstd.ZstdCompressor(level=3)
+_dctx = zstd.ZstdDecompressor()
+
+_lock = threading.RLock()
+
+wal_fp = None
+wal_lines = 0
+_write_q = queue.Queue()
+
+_all_tasks_cache = None
+_task_comments_cache = {}
+_task_cache = {}
+_comment_cache = {}
+
+_id_lock = threading.Lock()
+_last_id_ms = 0
+_id_seq = 0
+
+
+def new_id():
+    # UUIDv7: 48-bit millisecond timestamp, then a 12-bit sequence so ids
+    # minted within the same millisecond still sort in creation order.
+    global _last_id_ms, _id_seq
+    with _id_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_id_ms:
+            _last_id_ms = ms
+            _id_seq = 0
+        else:
+            _id_seq += 1
+            if _id_seq > 0xFFF:
+                _last_id_ms += 1
+                _id_seq = 0
+        value = (_last_id_ms << 80) | (0x7 << 76) | (_id_seq << 64) | (0b10 << 62) | secrets.randbits(62)
+    return uuid.UUID(int=value)
+
+
+def id_key(id_str):
+    # Records are keyed by the 128-bit integer value of their UUID; the
+    # string form only appears in JSON payloads.
+    return uuid.UUID(id_str).int
+
+
+def _utc_now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def intern_author(author):
+    # Most comments come from a handful of authors; share one string per name.
+    return sys.intern(author) if isinstance(author, str) else author
+
+
+def load_comment(data):
+    comment = Comment(**data)
+    comment.author = intern_author(comment.author)
+    return comment
+
+
+def apply_event(event):
+    op = event['op']
+    key = id_key(event['id'])
+    if op == 'put_task':
+        tasks[key] = Task(**event['data'])
+    elif op == 'del_task':
+        tasks.pop(key, None)
+        for comment_key in comments_by_task.pop(key, {}):
+            comments.pop(comment_key, None)
+            comment_task_keys.pop(comment_key, None)
+    elif op == 'put_comment':
+        comment = load_comment(event['data'])
+        existing = comments.get(key)
+        if existing is not None:
+            existing.content = comment.content
+            existing.author = comment.author
+            existing.updated_at = comment.updated_at
+        else:
+            task_key = id_key(comment.task_id)
+            comments[key] = comment
+            comment_task_keys[key] = task_key
+            comments_by_task.setdefault(task_key, {})[key] = comment
+    elif op == 'del_comment':
+        if comments.pop(key, None) is not None:
+            comments_by_task[comment_task_keys.pop(key)].pop(key, None)
+
+
+def read_snapshot():
+    try:
+        with open(DATA_FILE, 'rb') as f:
+            return _dctx.decompress(f.read())
+    except FileNotFoundError:
+        pass
+    # Snapshots written before compression was added are plain JSON.
+    with open(LEGACY_DATA_FILE, 'rb') as f:
+        return f.read()
 
 
 def load_data():
-    global tasks, comments
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
-                tasks = data.get('tasks', {})
-                comments = data.get('comments', {})
-                print(f"Loaded {len(tasks)} tasks and {len(comments)} comments from {DATA_FILE}")
-        except Exception as e:
-            print(f"Error loading data: {e}")
-            tasks = {}
-            comments = {}
-    else:
+    global wal_lines, _all_tasks_cache
+    tasks.clear()
+    comments.clear()
+    comments_by_task.clear()
+    comment_task_keys.clear()
+    _all_tasks_cache = None
+    _task_comments_cache.clear()
+    _task_cache.clear()
+    _comment_cache.clear()
+    wal_lines = 0
+    
+    try:
+        data = orjson.loads(read_snapshot())
+        skipped = 0
+        for task_id, task in data.get('tasks', {}).items():
+            try:
+                tasks[id_key(task_id)] = Task(**task)
+            except ValueError:
+                skipped += 1
+        loaded = []
+        for comment_id, comment in data.get('comments', {}).items():
+            comment = load_comment(comment)
+            try:
+                key, task_key = id_key(comment_id), id_key(comment.task_id)
+            except ValueError:
+                skipped += 1
+                continue
+            # Ties on created_at fall back to the time-ordered UUIDv7 id.
+            loaded.append((comment.created_at, comment.id, key, task_key, comment))
+        loaded.sort()
+        for _, _, key, task_key, comment in loaded:
+            comments[key] = comment
+            comment_task_keys[key] = task_key
+            comments_by_task.setdefault(task_key, {})[key] = comment
+        print(f"Loaded {len(tasks)} tasks and {len(comments)} comments from snapshot")
+        if skipped:
+            print(f"Skipped {skipped} records whose ids are not UUIDs")
+    except FileNotFoundError:
         print(f"No data file found, starting with empty storage")
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        tasks.clear()
+        comments.clear()
+        comments_by_task.clear()
+        comment_task_keys.clear()
+    
+    try:
+        with open(WAL_FILE, 'rb') as f:
+            good_offset = 0
+            torn = False
+            for line in f:
+                # A line without its newline, or one that does not decode, is
+                # the tail of a write that never completed.
+                if not line.endswith(b'\n'):
+                    torn = True
+                    break
+                if line.strip():
+                    try:
+                        event = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        torn = True
+                        break
+                    try:
+                        apply_event(event)
+                    except Exception as e:
+                        print(f"Skipping bad event in {WAL_FILE}: {e}")
+                    wal_lines += 1
+                good_offset += len(line)
+        if torn:
+            # Cut the torn tail so new events are not appended after it and
+            # lost on the next replay.
+            os.truncate(WAL_FILE, good_offset)
+            print(f"Truncated torn write at byte {good_offset} of {WAL_FILE}")
+        print(f"Replayed {wal_lines} events from {WAL_FILE}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error replaying {WAL_FILE}: {e}")
 
 
 def save_data():
     try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump({'tasks': tasks, 'comments': comments}, f, indent=2)
+        # Only the encode needs a consistent view of the data; compression
+        # and file IO run without holding up requests.
+        with _lock:
+            raw = orjson.dumps({
+                'tasks': {task.id: task for task in tasks.values()},
+                'comments': {comment.id: comment for comment in comments.values()}
+            })
+        payload = _cctx.compress(raw)
+        tmp_file = DATA_FILE + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, DATA_FILE)
+        return True
     except Exception as e:
         print(f"Error saving data: {e}")
+        return False
+
+
+def append_event(event):
+    _write_q.put(event)
+
+
+def write_events(batch):
+    global wal_lines
+    try:
+        wal_fp.write(b''.join(orjson.dumps(event) + b'\n' for event in batch))
+        wal_fp.flush()
+        wal_lines += len(batch)
+        maybe_compact()
+    except Exception as e:
+        print(f"Error writing {WAL_FILE}: {e}")
+
+
+def _writer():
+    while True:
+        batch = [_write_q.get()]
+        try:
+            while len(batch) < WRITE_BATCH_SIZE:
+                batch.append(_write_q.get_nowait())
+        except queue.Empty:
+            pass
+        # Nothing may escape this loop: a dead writer would strand every
+        # later event in the queue and hang flush_writes() at exit.
+        try:
+            write_events(batch)
+        except Exception as e:
+            print(f"Error in {WAL_FILE} writer: {e}")
+        finally:
+            for _ in batch:
+                _write_q.task_done()
+
+
+def flush_writes():
+    _write_q.join()
+
+
+def compact():
+    global wal_lines
+    if save_data():
+        wal_fp.truncate(0)
+        wal_lines = 0
+
+
+def maybe_compact():
+    if wal_lines >= WAL_COMPACT_THRESHOLD:
+        compact()
 
 
 load_data()
+# Kept open for the life of the process. The buffered writer retries short
+# writes, and each batch is flushed as soon as it is written.
+wal_fp = open(WAL_FILE, 'ab')
+atexit.register(wal_fp.close)
+maybe_compact()
+# Started at import time, so gunicorn must not use --preload: the thread
+# would live in the master process and never reach the worker.
+threading.Thread(target=_writer, name='wal-writer', daemon=True).start()
+atexit.register(flush_writes)
+
+
+def ojson(obj, status=200):
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
 
 
-def get_comments_by_task(task_id):
-    return [comment for comment in comments.values() if comment['task_id'] == task_id]
+def get_comments_by_task(task_key):
+    return list(reversed(comments_by_task.get(task_key, {}).values()))
+
+
+@app.errorhandler(404)
+def not_found(error):
+    return ojson({'error': 'Not found'}, 404)
 
 
 @app.route('/api/tasks', methods=['GET'])
 def get_all_tasks():
-    return jsonify(list(tasks.values())), 200
+    global _all_tasks_cache
+    body = _all_tasks_cache
+    if body is None:
+        with _lock:
+            body = _all_tasks_cache = orjson.dumps(list(tasks.values()))
+    return Response(body, status=200, mimetype='application/json')
 
 @app.route('/api/tasks', methods=['POST'])
 def create_task():
+    global _all_tasks_cache
     data = request.get_json()
     
     if not data or 'title' not in data:
-        return jsonify({'error': 'Title is required'}), 400
+        return ojson({'error': 'Title is required'}, 400)
     
-    task_id = str(uuid.uuid4())
-    task = {
-        'id': task_id,
-        'title': data['title'],
-        'description': data.get('description', ''),
-        'created_at': datetime.now(timezone.utc).isoformat()
-    }
+    task_uuid = new_id()
+    task = Task(
+        id=str(task_uuid),
+        title=data['title'],
+        description=data.get('description', ''),
+        created_at=_utc_now_iso()
+    )
+    body = orjson.dumps(task)
     
-    tasks[task_id] = task
-    save_data()
-    return jsonify(task), 201
+    with _lock:
+        tasks[task_uuid.int] = task
+        _all_tasks_cache = None
+        append_event({'op': 'put_task', 'id': task.id, 'data': task})
+    return Response(body, status=201, mimetype='application/json')
 
 
-@app.route('/api/tasks/<task_id>', methods=['GET'])
+@app.route('/api/tasks/<uuid:task_id>', methods=['GET'])
 def get_task(task_id):
-    task = tasks.get(task_id)
-    
-    if not task:
-        return jsonify({'error': 'Task not found'}), 404
-    
-    return jsonify(task), 200
-
-
-@app.route('/api/tasks/<task_id>', methods=['PUT'])
+    key = task_id.int
+    body = _task_cache.get(key)
+    if body is None:
+        with _lock:
+            task = tasks.get(key)
+            
+            if not task:
+                return ojson({'error': 'Task not found'}, 404)
+            
+            body = _task_cache[key] = orjson.dumps(task)
+    return Response(body, status=200, mimetype='application/json')
+
+
+@app.route('/api/tasks/<uuid:task_id>', methods=['PUT'])
 def update_task(task_id):
-    task = tasks.get(task_id)
-    
-    if not task:
-        return jsonify({'error': 'Task not found'}), 404
-    
+    global _all_tasks_cache
+    key = task_id.int
     data = request.get_json()
     
-    if not data:
-        return jsonify({'error': 'No data provided'}), 400
-    
-    if 'title' in data:
-        if not data['title'].strip():
-            return jsonify({'error': 'Title cannot be empty'}), 400
-        task['title'] = data['title']
-    
-    if 'description' in data:
-        task['description'] = data['description']
-    
-    save_data()
-    return jsonify(task), 200
-
-
-@app.route('/api/tasks/<task_id>', methods=['DELETE'])
+    with _lock:
+        task = tasks.get(key)
+        
+        if task is None:
+            return ojson({'error': 'Task not found'}, 404)
+        
+        if not data:
+            return ojson({'error': 'No data provided'}, 400)
+        
+        if 'title' in data:
+            title = data['title']
+            if not title or title.isspace():
+                return ojson({'error': 'Title cannot be empty'}, 400)
+            task.title = title
+        
+        if 'description' in data:
+            task.description = data['description']
+        
+        _all_tasks_cache = None
+        _task_cache.pop(key, None)
+        append_event({'op': 'put_task', 'id': task.id, 'data': task})
+        body = orjson.dumps(task)
+    return Response(body, status=200, mimetype='application/json')
+
+
+@app.route('/api/tasks/<uuid:task_id>', methods=['DELETE'])
 def delete_task(task_id):
-    task = tasks.get(task_id)
-    
-    if not task:
-        return jsonify({'error': 'Task not found'}), 404
-    
-    deleted_task = tasks.pop(task_id)
-    
-    task_comment_ids = [c_id for c_id, c in comments.items() if c['task_id'] == task_id]
-    for c_id in task_comment_ids:
-        comments.pop(c_id)
-    
-    save_data()
-    return jsonify({
+    global _all_tasks_cache
+    key = task_id.int
+    
+    with _lock:
+        deleted_task = tasks.pop(key, None)
+        
+        if deleted_task is None:
+            return ojson({'error': 'Task not found'}, 404)
+        
+        for comment_key in comments_by_task.pop(key, {}):
+            comments.pop(comment_key, None)
+            comment_task_keys.pop(comment_key, None)
+            _comment_cache.pop(comment_key, None)
+        
+        _all_tasks_cache = None
+        _task_cache.pop(key, None)
+        _task_comments_cache.pop(key, None)
+        append_event({'op': 'del_task', 'id': deleted_task.id})
+    return ojson({
         'message': 'Task deleted successfully',
         'task': deleted_task
-    }), 200
+    }, 200)
 
 
-@app.route('/api/tasks/<task_id>/comments', methods=['POST'])
+@app.route('/api/tasks/<uuid:task_id>/comments', methods=['POST'])
 def create_comment(task_id):
     data = request.get_json()
     
     if not data or 'content' not in data:
-        return jsonify({'error': 'Content is required'}), 400
-    
-    if not data['content'].strip():
-        return jsonify({'error': 'Content cannot be empty'}), 400
-    
-    comment_id = str(uuid.uuid4())
-    comment = {
-        'id': comment_id,
-        'task_id': task_id,
-        'content': data['content'],
-        'author': data.get('author', 'Anonymous'),
-        'created_at': datetime.now(timezone.utc).isoformat(),
-        'updated_at': datetime.now(timezone.utc).isoformat()
-    }
-    
-    comments[comment_id] = comment
-    save_data()
-    return jsonify(comment), 201
-
-
-@app.route('/api/tasks/<task_id>/comments', methods=['GET'])
+        return ojson({'error': 'Content is required'}, 400)
+    
+    content = data['content']
+    if not content or content.isspace():
+        return ojson({'error': 'Content cannot be empty'}, 400)
+    author = intern_author(data.get('author', 'Anonymous'))
+    
+    comment_uuid = new_id()
+    now_iso = _utc_now_iso()
+    comment = Comment(
+        id=str(comment_uuid),
+        task_id=str(task_id),
+        content=content,
+        author=author,
+        created_at=now_iso,
+        updated_at=now_iso
+    )
+    body = orjson.dumps(comment)
+    
+    with _lock:
+        comments[comment_uuid.int] = comment
+        comment_task_keys[comment_uuid.int] = task_id.int
+        comments_by_task.setdefault(task_id.int, {})[comment_uuid.int] = comment
+        _task_comments_cache.pop(task_id.int, None)
+        append_event({'op': 'put_comment', 'id': comment.id, 'data': comment})
+    return Response(body, status=201, mimetype='application/json')
+
+
+@app.route('/api/tasks/<uuid:task_id>/comments', methods=['GET'])
 def get_comments(task_id):
-    task_comments = get_comments_by_task(task_id)
-    task_comments.sort(key=lambda x: x['created_at'], reverse=True)
-    
-    return jsonify({
-        'task_id': task_id,
-        'comments': task_comments,
-        'count': len(task_comments)
-    }), 200
-
-
-@app.route('/api/comments/<comment_id>', methods=['GET'])
+    key = task_id.int
+    body = _task_comments_cache.get(key)
+    if body is None:
+        with _lock:
+            task_comments = get_comments_by_task(key)
+            body = orjson.dumps({
+                'task_id': str(task_id),
+                'comments': task_comments,
+                'count': len(task_comments)
+            })
+            # Only cache ids that exist, so lookups of arbitrary ids can't
+            # grow the cache without bound.
+            if key in comments_by_task or key in tasks:
+                _task_comments_cache[key] = body
+    return Response(body, status=200, mimetype='application/json')
+
+
+@app.route('/api/comments/<uuid:comment_id>', methods=['GET'])
 def get_comment(comment_id):
-    comment = comments.get(comment_id)
-    
-    if not comment:
-        return jsonify({'error': 'Comment not found'}), 404
-    
-    return jsonify(comment), 200
-
-
-@app.route('/api/comments/<comment_id>', methods=['PUT'])
+    key = comment_id.int
+    body = _comment_cache.get(key)
+    if body is None:
+        with _lock:
+            comment = comments.get(key)
+            
+            if not comment:
+                return ojson({'error': 'Comment not found'}, 404)
+            
+            body = _comment_cache[key] = orjson.dumps(comment)
+    return Response(body, status=200, mimetype='application/json')
+
+
+@app.route('/api/comments/<uuid:comment_id>', methods=['PUT'])
 def update_comment(comment_id):
-    comment = comments.get(comment_id)
-    
-    if not comment:
-        return jsonify({'error': 'Comment not found'}), 404
-    
+    key = comment_id.int
     data = request.get_json()
     
-    if not data:
-        return jsonify({'error': 'No data provided'}), 400
-    
-    if 'content' in data:
-        if not data['content'].strip():
-            return jsonify({'error': 'Content cannot be empty'}), 400
-        comment['content'] = data['content']
-    
-    if 'author' in data:
-        comment['author'] = data['author']
-    
-    comment['updated_at'] = datetime.now(timezone.utc).isoformat()
-    
-    save_data()
-    return jsonify(comment), 200
-
-
-@app.route('/api/comments/<comment_id>', methods=['DELETE'])
+    with _lock:
+        comment = comments.get(key)
+        
+        if comment is None:
+            return ojson({'error': 'Comment not found'}, 404)
+        
+        if not data:
+            return ojson({'error': 'No data provided'}, 400)
+        
+        if 'content' in data:
+            content = data['content']
+            if not content or content.isspace():
+                return ojson({'error': 'Content cannot be empty'}, 400)
+            comment.content = content
+        
+        if 'author' in data:
+            comment.author = intern_author(data['author'])
+        
+        comment.updated_at = _utc_now_iso()
+        
+        _task_comments_cache.pop(comment_task_keys[key], None)
+        _comment_cache.pop(key, None)
+        append_event({'op': 'put_comment', 'id': comment.id, 'data': comment})
+        body = orjson.dumps(comment)
+    return Response(body, status=200, mimetype='application/json')
+
+
+@app.route('/api/comments/<uuid:comment_id>', methods=['DELETE'])
 def delete_comment(comment_id):
-    comment = comments.get(comment_id)
-    
-    if not comment:
-        return jsonify({'error': 'Comment not found'}), 404
-    
-    deleted_comment = comments.pop(comment_id)
-    save_data()
-    
-    return jsonify({
+    key = comment_id.int
+    
+    with _lock:
+        deleted_comment = comments.pop(key, None)
+        
+        if deleted_comment is None:
+            return ojson({'error': 'Comment not found'}, 404)
+        
+        task_key = comment_task_keys.pop(key)
+        del comments_by_task[task_key][key]
+        _task_comments_cache.pop(task_key, None)
+        _comment_cache.pop(key, None)
+        append_event({'op': 'del_comment', 'id': deleted_comment.id})
+    
+    return ojson({
         'message': 'Comment deleted successfully',
         'comment': deleted_comment
-    }), 200
+    }, 200)
 
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({
+    return ojson({
         'status': 'healthy',
-        'timestamp': datetime.now(timezone.utc).isoformat()
-    }), 200
+        'timestamp': _utc_now_iso(),
+        'write_queue_depth': _write_q.qsize()
+    }, 200)
 
 
 if __name__ == '__main__':
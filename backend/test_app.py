@@ -1,7 +1,10 @@
 import unittest
 import json
 import os
-from app import app, tasks, comments, DATA_FILE
+import threading
+import uuid
+import app as app_module
+from app import app, tasks, comments, comments_by_task, comment_task_keys, load_data, compact, flush_writes, id_key, DATA_FILE
 
 
 class TestCommentAPI(unittest.TestCase):
@@ -16,10 +19,16 @@ class TestCommentAPI(unittest.TestCase):
         # Clear storage
         tasks.clear()
         comments.clear()
+        comments_by_task.clear()
+        comment_task_keys.clear()
         
-        # Remove data file if it exists
-        if os.path.exists(DATA_FILE):
+        # Reset the write-ahead log and remove the data file
+        flush_writes()
+        compact()
+        try:
             os.remove(DATA_FILE)
+        except FileNotFoundError:
+            pass
         
         # Create a test task for comment operations
         response = self.client.post(
@@ -34,6 +43,8 @@ class TestCommentAPI(unittest.TestCase):
         """Clean up after each test"""
         tasks.clear()
         comments.clear()
+        comments_by_task.clear()
+        comment_task_keys.clear()
     
     # Helper methods
     def create_comment(self, task_id, content, author='Test Author'):
@@ -83,11 +94,12 @@ class TestCommentAPI(unittest.TestCase):
     
     def test_create_comment_task_not_found(self):
         """Test comment creation for non-existent task"""
-        response = self.create_comment('non-existent-task-id', 'Test comment')
+        unknown_task_id = str(uuid.uuid4())
+        response = self.create_comment(unknown_task_id, 'Test comment')
         
         self.assertEqual(response.status_code, 201)
         data = json.loads(response.data)
-        self.assertEqual(data['task_id'], 'non-existent-task-id')
+        self.assertEqual(data['task_id'], unknown_task_id)
     
     def test_create_comment_with_anonymous_author(self):
         """Test comment creation without author (should default to Anonymous)"""
@@ -101,6 +113,13 @@ class TestCommentAPI(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data['author'], 'Anonymous')
     
+    def test_comment_authors_are_shared(self):
+        """Test repeated author names share a single string object"""
+        first = json.loads(self.create_comment(self.test_task_id, 'One', 'Shared ' + 'Author').data)
+        second = json.loads(self.create_comment(self.test_task_id, 'Two', 'Shared Author').data)
+        
+        self.assertIs(comments[id_key(first['id'])].author, comments[id_key(second['id'])].author)
+    
     # READ tests
     def test_get_comments_for_task(self):
         """Test retrieving all comments for a task"""
@@ -118,6 +137,18 @@ class TestCommentAPI(unittest.TestCase):
         self.assertEqual(data['count'], 3)
         self.assertEqual(len(data['comments']), 3)
     
+    def test_get_comments_newest_first(self):
+        """Test comments are returned newest first"""
+        self.create_comment(self.test_task_id, 'First comment')
+        self.create_comment(self.test_task_id, 'Second comment')
+        self.create_comment(self.test_task_id, 'Third comment')
+        
+        response = self.client.get(f'/api/tasks/{self.test_task_id}/comments')
+        data = json.loads(response.data)
+        
+        contents = [c['content'] for c in data['comments']]
+        self.assertEqual(contents, ['Third comment', 'Second comment', 'First comment'])
+    
     def test_get_comments_empty_list(self):
         """Test retrieving comments when none exist"""
         response = self.client.get(f'/api/tasks/{self.test_task_id}/comments')
@@ -130,13 +161,22 @@ class TestCommentAPI(unittest.TestCase):
     
     def test_get_comments_task_not_found(self):
         """Test retrieving comments for any task_id"""
-        response = self.client.get('/api/tasks/non-existent-task/comments')
+        response = self.client.get(f'/api/tasks/{uuid.uuid4()}/comments')
         
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertEqual(data['count'], 0)
         self.assertEqual(len(data['comments']), 0)
     
+    def test_get_comments_unknown_task_not_cached(self):
+        """Test listing comments of unknown task ids does not fill the cache"""
+        cached_before = len(app_module._task_comments_cache)
+        for _ in range(5):
+            response = self.client.get(f'/api/tasks/{uuid.uuid4()}/comments')
+            self.assertEqual(json.loads(response.data)['count'], 0)
+        
+        self.assertEqual(len(app_module._task_comments_cache), cached_before)
+    
     def test_get_single_comment(self):
         """Test retrieving a specific comment"""
         create_response = self.create_comment(self.test_task_id, 'Test comment')
@@ -152,11 +192,19 @@ class TestCommentAPI(unittest.TestCase):
     
     def test_get_single_comment_not_found(self):
         """Test retrieving a non-existent comment"""
-        response = self.client.get('/api/comments/non-existent-id')
+        response = self.client.get(f'/api/comments/{uuid.uuid4()}')
         
         self.assertEqual(response.status_code, 404)
         data = json.loads(response.data)
-        self.assertIn('error', data)
+        self.assertEqual(data['error'], 'Comment not found')
+    
+    def test_get_single_comment_malformed_id(self):
+        """Test an id that is not a UUID gets a JSON 404"""
+        response = self.client.get('/api/comments/non-existent-id')
+        
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(json.loads(response.data), {'error': 'Not found'})
     
     # UPDATE tests
     def test_update_comment_content(self):
@@ -182,6 +230,21 @@ class TestCommentAPI(unittest.TestCase):
         # The timestamp should be greater than or equal to the original
         self.assertGreaterEqual(data['updated_at'], original_updated_at)
     
+    def test_update_comment_reflected_in_task_list(self):
+        """Test the task's comment list is refreshed after an update"""
+        comment_id = json.loads(self.create_comment(self.test_task_id, 'Original').data)['id']
+        self.client.get(f'/api/tasks/{self.test_task_id}/comments')
+        
+        self.client.put(
+            f'/api/comments/{comment_id}',
+            data=json.dumps({'content': 'Edited'}),
+            content_type='application/json'
+        )
+        
+        response = self.client.get(f'/api/tasks/{self.test_task_id}/comments')
+        data = json.loads(response.data)
+        self.assertEqual(data['comments'][0]['content'], 'Edited')
+    
     def test_update_comment_author(self):
         """Test updating comment author"""
         create_response = self.create_comment(self.test_task_id, 'Test content')
@@ -361,6 +424,25 @@ class TestCommentAPI(unittest.TestCase):
         
         self.assertEqual(task1_data['count'], 2)
         self.assertEqual(task2_data['count'], 1)
+    
+    def test_delete_task_removes_its_comments(self):
+        """Test that deleting a task cascades to its comments only"""
+        task2_response = self.client.post(
+            '/api/tasks',
+            data=json.dumps({'title': 'Task 2'}),
+            content_type='application/json'
+        )
+        task2_id = json.loads(task2_response.data)['id']
+        
+        comment_id = json.loads(self.create_comment(self.test_task_id, 'Doomed').data)['id']
+        self.create_comment(task2_id, 'Survivor')
+        
+        response = self.client.delete(f'/api/tasks/{self.test_task_id}')
+        self.assertEqual(response.status_code, 200)
+        
+        self.assertEqual(self.client.get(f'/api/comments/{comment_id}').status_code, 404)
+        remaining = json.loads(self.client.get(f'/api/tasks/{task2_id}/comments').data)
+        self.assertEqual(remaining['count'], 1)
 
 
 class TestTaskAPI(unittest.TestCase):
@@ -373,10 +455,16 @@ class TestTaskAPI(unittest.TestCase):
         self.app.config['TESTING'] = True
         tasks.clear()
         comments.clear()
+        comments_by_task.clear()
+        comment_task_keys.clear()
         
-        # Remove data file if it exists
-        if os.path.exists(DATA_FILE):
+        # Reset the write-ahead log and remove the data file
+        flush_writes()
+        compact()
+        try:
             os.remove(DATA_FILE)
+        except FileNotFoundError:
+            pass
     
     def test_get_all_tasks(self):
         """Test getting all tasks"""
@@ -389,6 +477,20 @@ class TestTaskAPI(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(len(data), 2)
     
+    def test_get_all_tasks_reflects_changes(self):
+        """Test the task list is refreshed after each write"""
+        create_response = self.client.post('/api/tasks', data=json.dumps({'title': 'Task 1'}), content_type='application/json')
+        task_id = json.loads(create_response.data)['id']
+        self.client.get('/api/tasks')
+        
+        self.client.put(f'/api/tasks/{task_id}', data=json.dumps({'title': 'Renamed'}), content_type='application/json')
+        data = json.loads(self.client.get('/api/tasks').data)
+        self.assertEqual([t['title'] for t in data], ['Renamed'])
+        
+        self.client.delete(f'/api/tasks/{task_id}')
+        data = json.loads(self.client.get('/api/tasks').data)
+        self.assertEqual(data, [])
+    
     def test_create_task(self):
         """Test task creation"""
         response = self.client.post(
@@ -402,6 +504,20 @@ class TestTaskAPI(unittest.TestCase):
         self.assertIn('id', data)
         self.assertEqual(data['title'], 'Test Task')
     
+    def test_task_ids_are_time_ordered(self):
+        """Test task ids are UUIDv7 and sort in creation order"""
+        ids = [
+            json.loads(self.client.post(
+                '/api/tasks',
+                data=json.dumps({'title': f'Task {i}'}),
+                content_type='application/json'
+            ).data)['id']
+            for i in range(5)
+        ]
+        
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(uuid.UUID(task_id).version == 7 for task_id in ids))
+    
     def test_get_task(self):
         """Test retrieving a task"""
         create_response = self.client.post(
@@ -436,6 +552,18 @@ class TestTaskAPI(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data['title'], 'Updated')
     
+    def test_get_task_reflects_update(self):
+        """Test a task read after an update returns the new values"""
+        create_response = self.client.post('/api/tasks', data=json.dumps({'title': 'Original'}), content_type='application/json')
+        task_id = json.loads(create_response.data)['id']
+        self.client.get(f'/api/tasks/{task_id}')
+        
+        self.client.put(f'/api/tasks/{task_id}', data=json.dumps({'description': 'Added'}), content_type='application/json')
+        
+        response = self.client.get(f'/api/tasks/{task_id}')
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(json.loads(response.data)['description'], 'Added')
+    
     def test_delete_task(self):
         """Test deleting a task"""
         create_response = self.client.post(
@@ -454,6 +582,163 @@ class TestTaskAPI(unittest.TestCase):
         self.assertEqual(get_response.status_code, 404)
 
 
+class TestPersistence(unittest.TestCase):
+    """Test cases for snapshot + write-ahead log persistence"""
+    
+    def setUp(self):
+        """Set up test client and empty storage"""
+        self.app = app
+        self.client = self.app.test_client()
+        self.app.config['TESTING'] = True
+        tasks.clear()
+        comments.clear()
+        comments_by_task.clear()
+        comment_task_keys.clear()
+        
+        # Reset the write-ahead log and remove the data file
+        flush_writes()
+        compact()
+        try:
+            os.remove(DATA_FILE)
+        except FileNotFoundError:
+            pass
+    
+    def test_reload_replays_log(self):
+        """Test that reloading rebuilds state from the write-ahead log"""
+        kept = json.loads(self.client.post(
+            '/api/tasks',
+            data=json.dumps({'title': 'Kept'}),
+            content_type='application/json'
+        ).data)
+        dropped = json.loads(self.client.post(
+            '/api/tasks',
+            data=json.dumps({'title': 'Dropped'}),
+            content_type='application/json'
+        ).data)
+        self.client.put(
+            f'/api/tasks/{kept["id"]}',
+            data=json.dumps({'title': 'Kept and renamed'}),
+            content_type='application/json'
+        )
+        comment = json.loads(self.client.post(
+            f'/api/tasks/{kept["id"]}/comments',
+            data=json.dumps({'content': 'Still here'}),
+            content_type='application/json'
+        ).data)
+        self.client.post(
+            f'/api/tasks/{dropped["id"]}/comments',
+            data=json.dumps({'content': 'Gone with its task'}),
+            content_type='application/json'
+        )
+        self.client.delete(f'/api/tasks/{dropped["id"]}')
+        
+        flush_writes()
+        load_data()
+        
+        self.assertEqual(list(tasks), [id_key(kept['id'])])
+        self.assertEqual(tasks[id_key(kept['id'])].title, 'Kept and renamed')
+        self.assertEqual(list(comments), [id_key(comment['id'])])
+        response = self.client.get(f'/api/tasks/{kept["id"]}/comments')
+        self.assertEqual(json.loads(response.data)['count'], 1)
+    
+    def test_compaction_writes_snapshot(self):
+        """Test that compaction folds the log into the snapshot"""
+        original_threshold = app_module.WAL_COMPACT_THRESHOLD
+        app_module.WAL_COMPACT_THRESHOLD = 2
+        try:
+            self.client.post('/api/tasks', data=json.dumps({'title': 'Task 1'}), content_type='application/json')
+            self.client.post('/api/tasks', data=json.dumps({'title': 'Task 2'}), content_type='application/json')
+            flush_writes()
+        finally:
+            app_module.WAL_COMPACT_THRESHOLD = original_threshold
+        
+        self.assertTrue(os.path.exists(DATA_FILE))
+        self.assertEqual(os.path.getsize(app_module.WAL_FILE), 0)
+        
+        load_data()
+        self.assertEqual(len(tasks), 2)
+    
+    def test_reload_keeps_comments_newest_first(self):
+        """Test comment order survives a compaction and reload"""
+        task_id = json.loads(self.client.post(
+            '/api/tasks',
+            data=json.dumps({'title': 'Busy'}),
+            content_type='application/json'
+        ).data)['id']
+        for i in range(20):
+            self.client.post(
+                f'/api/tasks/{task_id}/comments',
+                data=json.dumps({'content': f'c{i}'}),
+                content_type='application/json'
+            )
+        live = json.loads(self.client.get(f'/api/tasks/{task_id}/comments').data)
+        
+        flush_writes()
+        compact()
+        load_data()
+        
+        reloaded = json.loads(self.client.get(f'/api/tasks/{task_id}/comments').data)
+        expected = [f'c{i}' for i in reversed(range(20))]
+        self.assertEqual([c['content'] for c in live['comments']], expected)
+        self.assertEqual([c['content'] for c in reloaded['comments']], expected)
+    
+    def test_writer_survives_compaction_failure(self):
+        """Test a failing compaction neither kills the writer nor hangs flushing"""
+        def failing_compact():
+            raise OSError('No space left on device')
+        
+        original_compact = app_module.compact
+        original_threshold = app_module.WAL_COMPACT_THRESHOLD
+        app_module.compact = failing_compact
+        app_module.WAL_COMPACT_THRESHOLD = 1
+        try:
+            self.client.post('/api/tasks', data=json.dumps({'title': 'Task 1'}), content_type='application/json')
+            flusher = threading.Thread(target=flush_writes, daemon=True)
+            flusher.start()
+            flusher.join(5)
+            self.assertFalse(flusher.is_alive())
+        finally:
+            app_module.compact = original_compact
+            app_module.WAL_COMPACT_THRESHOLD = original_threshold
+        
+        self.client.post('/api/tasks', data=json.dumps({'title': 'Task 2'}), content_type='application/json')
+        flush_writes()
+        
+        load_data()
+        self.assertEqual(len(tasks), 2)
+    
+    def test_torn_log_tail_does_not_hide_later_writes(self):
+        """Test a partial last line is cut so later events still replay"""
+        self.client.post('/api/tasks', data=json.dumps({'title': 'A'}), content_type='application/json')
+        flush_writes()
+        with open(app_module.WAL_FILE, 'ab') as f:
+            f.write(b'{"op":"put_task","id":"0190')
+        
+        load_data()
+        self.client.post('/api/tasks', data=json.dumps({'title': 'B'}), content_type='application/json')
+        self.client.post('/api/tasks', data=json.dumps({'title': 'C'}), content_type='application/json')
+        flush_writes()
+        load_data()
+        
+        self.assertEqual(sorted(task.title for task in tasks.values()), ['A', 'B', 'C'])
+    
+    def test_load_legacy_uncompressed_snapshot(self):
+        """Test that a plain data.json from older versions is still loaded"""
+        task_id = str(uuid.uuid4())
+        legacy = {
+            'tasks': {task_id: {'id': task_id, 'title': 'Old', 'description': '', 'created_at': '2025-01-01T00:00:00+00:00'}},
+            'comments': {}
+        }
+        with open(app_module.LEGACY_DATA_FILE, 'w') as f:
+            json.dump(legacy, f)
+        try:
+            load_data()
+        finally:
+            os.remove(app_module.LEGACY_DATA_FILE)
+        
+        self.assertEqual(tasks[id_key(task_id)].title, 'Old')
+
+
 class TestHealthCheck(unittest.TestCase):
     """Test cases for health check endpoint"""
     
@@ -463,10 +748,16 @@ class TestHealthCheck(unittest.TestCase):
         self.client = self.app.test_client()
         self.app.config['TESTING'] = True
         comments.clear()
+        comments_by_task.clear()
+        comment_task_keys.clear()
         
-        # Remove data file if it exists
-        if os.path.exists(DATA_FILE):
+        # Reset the write-ahead log and remove the data file
+        flush_writes()
+        compact()
+        try:
             os.remove(DATA_FILE)
+        except FileNotFoundError:
+            pass
     
     def test_health_check(self):
         """Test health check endpoint"""
@@ -474,6 +765,7 @@ class TestHealthCheck(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertEqual(data['status'], 'healthy')
+        self.assertIn('write_queue_depth', data)
 
 
 if __name__ == '__main__':